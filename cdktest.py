@@ -5,18 +5,23 @@ inspired by https://github.com/GoogleCloudPlatform/terraform-python-testing-help
 """
 import os
 import json
-import logging
+import codecs
+import sys
 import inspect
+import logging
 import subprocess
 import pickle
 import weakref
 import shutil
+import signal
 import stat
+import threading
+import time
 
-from typing import Dict, List, Any
+from typing import Callable, ClassVar, Dict, List, Any, Sequence
 from pathlib import Path
 from hashlib import sha1
-from collections import namedtuple, abc
+from collections import namedtuple, abc, deque
 
 
 __version__ = "0.0.1"
@@ -25,12 +30,94 @@ _LOGGER = logging.getLogger("cdktest")
 
 CDKCommandOutput = namedtuple("CDKCommandOutput", "retcode out err")
 
+# characters of parsed output kept for error messages
+_OUTPUT_TAIL_SIZE = 65536
+
 
 class CDKTestError(Exception):
     "Customize Exception class"
     pass
 
 
+class CDKTestTimeoutError(CDKTestError):
+    "Raised when a CDK command does not finish within its timeout"
+    pass
+
+
+def _default_max_processes() -> int:
+    """Return the process limit from CDKTEST_MAX_PROCESSES or the CPU count."""
+    default = os.cpu_count() or 1
+    value = os.environ.get("CDKTEST_MAX_PROCESSES")
+    if value is None:
+        return default
+    try:
+        count = int(value)
+    except ValueError:
+        count = 0
+    if count < 1:
+        _LOGGER.warning(
+            "Ignoring invalid CDKTEST_MAX_PROCESSES=%r, using %s", value, default
+        )
+        return default
+    return count
+
+
+# Limits concurrent CDK processes across all CDKTest instances
+_PROCESS_SLOTS = threading.BoundedSemaphore(_default_max_processes())
+
+
+def set_max_processes(count: int) -> None:
+    """Set how many CDK processes may run at the same time.
+
+    Commands already running keep their slot; the new limit applies to
+    commands started after this call.
+
+    Args:
+      count: Maximum number of concurrent CDK processes, at least 1.
+    """
+    global _PROCESS_SLOTS
+    if count < 1:
+        raise CDKTestError("Maximum number of processes must be at least 1")
+    _PROCESS_SLOTS = threading.BoundedSemaphore(count)
+
+
+def _kill_process_group(p: subprocess.Popen, grace: float = 5.0) -> None:
+    """Terminate a process and any children sharing its process group.
+
+    The group is signalled even after the process exited, as its id cannot be
+    reused while a child is still in it. On Windows there is no process group
+    to signal, so the process tree is killed with taskkill while the process
+    is still running; children outliving a process that already exited
+    cannot be found safely.
+    """
+    if os.name == "nt":
+        if p.poll() is None:
+            subprocess.run(
+                ["taskkill", "/T", "/F", "/PID", str(p.pid)],
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            )
+        return
+    try:
+        os.killpg(p.pid, signal.SIGTERM)
+    except (ProcessLookupError, PermissionError):
+        return
+    try:
+        p.wait(grace)
+    except subprocess.TimeoutExpired:
+        pass
+    try:
+        os.killpg(p.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+def _check_timeout(timeout: float) -> None:
+    """Raise CDKTestError unless timeout is None or a positive number."""
+    if timeout is not None and not timeout > 0:
+        raise CDKTestError("Timeout must be a positive number of seconds")
+
+
 def parse_args(cmd: str, appdir: str) -> List[str]:
     """Check cdk files and add arguments for use in CDK commands.
 
@@ -62,6 +149,15 @@ def parse_args(cmd: str, appdir: str) -> List[str]:
     return cmd_args
 
 
+def _caller_dir(depth: int) -> Path:
+    """Return the directory of the file calling the function depth frames up.
+
+    Only the needed frame is looked up, unlike inspect.stack() which reads
+    the source of every frame on the stack.
+    """
+    return Path(os.path.dirname(sys._getframe(depth + 1).f_code.co_filename))
+
+
 class CFTemplateJSONBase(abc.Mapping):
     "Base class for JSON wrappers."
 
@@ -87,20 +183,190 @@ class CFTemplateJSONBase(abc.Mapping):
 class CFTemplateResources(CFTemplateJSONBase):
     "Minimal wrapper for parsed cf template resources."
 
-    def __init__(self, raw):
+    def __init__(
+        self,
+        raw,
+        resources: Dict[str, List[Any]] = None,
+        logical_ids: Dict[str, List[str]] = None,
+    ):
         super().__init__(raw)
         self.all_resources = self._raw.get("Resources")
-        self._resources = None
+        self._resources = resources
+        self._logical_ids = logical_ids
+
+    def _index(self):
+        resources, logical_ids = {}, {}
+        for k, v in self.all_resources.items():
+            resources.setdefault(v["Type"], []).append(v.get("Properties", {}))
+            logical_ids.setdefault(v["Type"], []).append(k)
+        self._resources, self._logical_ids = resources, logical_ids
 
     @property
     def resources(self):
+        "Resource properties grouped by resource type."
         if self._resources is None:
-            resources = {item["Type"]: [] for item in self.all_resources.values()}
-            for _, v in self.all_resources.items():
-                resources[v["Type"]].append(v["Properties"])
-            self._resources = resources
+            self._index()
         return self._resources
 
+    @property
+    def logical_ids(self):
+        "Resource logical IDs grouped by resource type."
+        if self._logical_ids is None:
+            self._index()
+        return self._logical_ids
+
+
+class CFTemplateStreamParser:
+    """Incremental parser for a JSON cf template read from cdk output.
+
+    Output is fed as it arrives. cdk prints templates indented, one member
+    per line, so each top-level member of the template, and each resource in
+    its Resources section, is decoded as soon as its closing line arrives and
+    resources are indexed by type on the way. Only the member being read is
+    held as text, never the whole output. Text before the template is
+    ignored, and templates printed on a single line are kept and decoded in
+    one go.
+    """
+
+    def __init__(self):
+        # incomplete last line of the output fed so far
+        self._partial = []
+        self._started = False
+        self._done = False
+        # lines of a template not laid out one member per line
+        self._raw_lines = None
+        self._unit = None
+        # 1 while reading template members, 2 inside its Resources section
+        self._level = 1
+        # text of the member being read and the line that closes it
+        self._member = []
+        self._closer = None
+        # members read but not decoded yet, decoded together to save calls
+        self._batch = []
+        # lines closing the Resources section and a single resource
+        self._resources_closer = None
+        self._resource_closer = None
+        self._template = {}
+        self._all_resources = None
+        self._resources = {}
+        self._logical_ids = {}
+
+    def feed(self, chunk: str) -> None:
+        """Consume a piece of output, processing every complete line in it."""
+        end = chunk.rfind("\n") + 1
+        if not end:
+            self._partial.append(chunk)
+            return
+        self._partial.append(chunk[:end])
+        text = "".join(self._partial)
+        self._partial = [chunk[end:]] if end < len(chunk) else []
+        self._scan(text)
+
+    def close(self) -> CFTemplateResources:
+        """Process the remaining output and return the parsed template."""
+        self.feed("\n")
+        if self._raw_lines is not None:
+            self._template = json.loads("\n".join(self._raw_lines))
+            return CFTemplateResources(self._template)
+        if not self._done:
+            raise CDKTestError("Could not find a complete template in cdk output")
+        return CFTemplateResources(self._template, self._resources, self._logical_ids)
+
+    def _scan(self, text: str) -> None:
+        """Process text made of complete lines."""
+        pos = 0
+        while pos < len(text) and not self._done:
+            if self._closer:
+                # nested lines are indented deeper, so the first line at the
+                # member's own indentation closes it
+                if text.startswith(self._closer, pos):
+                    index = pos
+                else:
+                    index = text.find("\n" + self._closer, pos) + 1
+                    if not index:
+                        self._member.append(text[pos:])
+                        break
+                end = text.find("\n", index)
+                self._member.append(text[pos:end])
+                self._add_member("".join(self._member))
+            elif self._resource_closer and not text.startswith(
+                self._resources_closer, pos
+            ):
+                # resources are laid out alike, so all of them complete before
+                # the end of Resources or of the text are taken as one block
+                stop = text.find("\n" + self._resources_closer, pos)
+                last = text.rfind(
+                    self._resource_closer, pos, len(text) if stop < 0 else stop
+                )
+                if last < 0:
+                    end = text.find("\n", pos)
+                    self._process(text[pos:end])
+                else:
+                    end = text.find("\n", last + 1)
+                    self._batch.append(text[pos:end].rstrip(", \t\r"))
+            else:
+                end = text.find("\n", pos)
+                self._process(text[pos:end])
+            pos = end + 1
+        self._decode_batch()
+
+    def _process(self, line: str) -> None:
+        if self._raw_lines is not None:
+            self._raw_lines.append(line)
+            return
+        stripped = line.strip()
+        if not self._started:
+            if stripped == "{":
+                self._started = True
+            elif stripped.startswith("{"):
+                self._raw_lines = [line]
+            return
+        if not stripped:
+            return
+        indent = len(line) - len(line.lstrip())
+        if self._unit is None:
+            self._unit = indent
+        if indent == (self._level - 1) * self._unit and stripped in ("}", "},"):
+            self._decode_batch()
+            if self._level == 2:
+                self._level, self._resource_closer = 1, None
+            else:
+                self._done = True
+            return
+        if indent != self._level * self._unit:
+            raise CDKTestError(f"Unexpected line in cdk template output: {line}")
+        if self._level == 1 and stripped == '"Resources": {':
+            self._decode_batch()
+            self._all_resources = self._template["Resources"] = {}
+            self._resources_closer = line[:indent] + "}"
+            self._level = 2
+        elif stripped[-1] in "{[":
+            if self._level == 2:
+                self._resource_closer = "\n" + line[:indent] + "}"
+            self._member = [line, "\n"]
+            self._closer = line[:indent] + ("}" if stripped[-1] == "{" else "]")
+        else:
+            self._add_member(line)
+
+    def _add_member(self, text: str) -> None:
+        self._member, self._closer = [], None
+        self._batch.append(text.rstrip(", \t\r"))
+
+    def _decode_batch(self) -> None:
+        if not self._batch:
+            return
+        members = json.loads("{" + ",".join(self._batch) + "}")
+        self._batch = []
+        if self._level == 1:
+            self._template.update(members)
+            return
+        self._all_resources.update(members)
+        for key, value in members.items():
+            self._resources.setdefault(value["Type"], []).append(
+                value.get("Properties", {})
+            )
+            self._logical_ids.setdefault(value["Type"], []).append(key)
+
 
 class CDKTest:
     """Helper class for use in testing CDK stacks.
@@ -118,8 +384,26 @@ class CDKTest:
       enable_cache: Determines if caching enabled for specific methods.
       cache_dir: Optional base directory to use for caching, defaults to
         the directory of the python file that instantiates this class
+      timeout: Optional number of seconds after which a cdk command and all
+        of its child processes are killed.
+      retries: Number of times a command failing with one of retry_retcodes
+        is run again.
+      retry_retcodes: Exit codes considered transient and worth retrying.
+      retry_backoff: Seconds to wait before the first retry, doubled for
+        each following attempt.
+
+    Use CDKTest.get() instead of the constructor to share one instance per
+    configuration between test modules.
     """
 
+    # registry key -> [instance, reference count], see get() and release()
+    _registry: ClassVar[Dict[str, list]] = {}
+    # folder removed at cleanup -> number of registered instances using it
+    _cleanup_refs: ClassVar[Dict[str, int]] = {}
+    # constructor signature used to build registry keys, set per class
+    _init_signature: ClassVar[inspect.Signature] = None
+    _registry_lock: ClassVar[threading.Lock] = threading.Lock()
+
     def __init__(
         self,
         appdir: str,
@@ -128,6 +412,10 @@ class CDKTest:
         env: Dict[str, str] = None,
         enable_cache: bool = False,
         cache_dir: str = None,
+        timeout: float = None,
+        retries: int = 0,
+        retry_retcodes: Sequence[int] = (),
+        retry_backoff: float = 1.0,
     ):
         """Set cdk app folder to operate on and optional base directory."""
         self._basedir = basedir or os.getcwd()
@@ -138,30 +426,135 @@ class CDKTest:
             if Path(appdir).is_absolute()
             else os.path.join(self._basedir, appdir)
         )
-        self.env = os.environ.copy()
+        # os.environ is only copied when env is first read
+        self._env = None
+        self._env_overrides = dict(env) if env else {}
+        self._registry_key = None
         self.enable_cache = enable_cache
-        self._template_formatter = lambda out: CFTemplateResources(json.loads(out))
+        _check_timeout(timeout)
+        self.timeout = timeout
+        self.retries = retries
+        self.retry_retcodes = tuple(retry_retcodes)
+        self.retry_backoff = retry_backoff
         if not cache_dir:
-            self.cache_dir = (
-                Path(os.path.dirname(inspect.stack()[1].filename)) / ".cdktest-cache"
-            )
+            self.cache_dir = _caller_dir(1) / ".cdktest-cache"
         else:
             self.cache_dir = Path(cache_dir)
-        if env:
-            self.env.update(env)
 
         # cleanup when instance deletion
         self._finalizer = weakref.finalize(
             self, self._cleanup, self.appdir, self.cache_dir
         )
 
+    @property
+    def env(self) -> Dict[str, str]:
+        """Environment passed to cdk, os.environ updated with custom variables."""
+        if self._env is None:
+            self._env = {**os.environ, **self._env_overrides}
+        return self._env
+
+    @env.setter
+    def env(self, value: Dict[str, str]) -> None:
+        self._env = value
+
+    @classmethod
+    def get(cls, appdir: str, **opts) -> "CDKTest":
+        """Return the shared instance for an app directory and options.
+
+        Instances are interned per class and configuration. cdk.out and the
+        cache folder are reference counted across all configurations using
+        them, and each is removed once, when the last user calls release().
+
+        Args:
+          appdir: The CDK app directory, as for the constructor.
+          opts: Keyword arguments accepted by the constructor.
+        """
+        if not opts.get("cache_dir"):
+            opts["cache_dir"] = str(_caller_dir(1) / ".cdktest-cache")
+        opts["basedir"] = opts.get("basedir") or os.getcwd()
+        key = cls._registry_key_for(appdir, opts)
+        with cls._registry_lock:
+            entry = cls._registry.get(key)
+            if entry is None:
+                instance = cls(appdir, **opts)
+                instance._registry_key = key
+                for target in instance._cleanup_targets():
+                    cls._cleanup_refs[target] = cls._cleanup_refs.get(target, 0) + 1
+                entry = cls._registry[key] = [instance, 0]
+            entry[1] += 1
+            return entry[0]
+
+    def release(self) -> None:
+        """Drop a reference obtained from get(), cleaning up after the last one.
+
+        Folders still used by another registered instance are kept. Instances
+        created directly with the constructor are cleaned up immediately.
+        """
+        with self._registry_lock:
+            entry = self._registry.get(self._registry_key)
+            if entry is None or entry[0] is not self:
+                self._finalizer()
+                return
+            entry[1] -= 1
+            if entry[1] > 0:
+                return
+            del self._registry[self._registry_key]
+            self._finalizer.detach()
+            unused = []
+            for target in self._cleanup_targets():
+                self._cleanup_refs[target] -= 1
+                if not self._cleanup_refs[target]:
+                    del self._cleanup_refs[target]
+                    unused.append(target)
+            # removed under the lock so that get() cannot hand out a folder
+            # while it is being deleted
+            cdkout, cache_dir = self._cleanup_targets()
+            self._cleanup(
+                self.appdir if cdkout in unused else None,
+                cache_dir if cache_dir in unused else None,
+            )
+
+    @classmethod
+    def _registry_key_for(cls, appdir: str, opts: Dict[str, Any]) -> str:
+        """Return the registry key for constructor arguments, defaults applied."""
+        signature = cls.__dict__.get("_init_signature")
+        if signature is None:
+            signature = cls._init_signature = inspect.signature(cls.__init__)
+        bound = signature.bind(None, appdir, **opts)
+        bound.apply_defaults()
+        args = dict(bound.arguments)
+        del args["self"]
+        # normalized the way the constructor does
+        args["appdir"] = os.path.normpath(os.path.join(args["basedir"], appdir))
+        if isinstance(args.get("binary"), str):
+            args["binary"] = args["binary"].split(" ")
+        if "env" in args:
+            args["env"] = dict(args["env"] or {})
+        if "cache_dir" in args:
+            args["cache_dir"] = os.path.normpath(os.path.abspath(args["cache_dir"]))
+        return json.dumps(
+            {"class": f"{cls.__module__}.{cls.__qualname__}", **args},
+            sort_keys=True,
+            default=str,
+        )
+
+    def _cleanup_targets(self):
+        """Return the cdk.out folder and the cache folder removed at cleanup."""
+        return (
+            os.path.normpath(os.path.join(self.appdir, "cdk.out")),
+            os.path.normpath(os.path.abspath(self.cache_dir)),
+        )
+
     @classmethod
     def _cleanup(
         cls,
         appdir: str,
         cache_dir: str,
     ) -> None:
-        """Remove cdk.out and/or .cdktest-cache folder at instance deletion."""
+        """Remove cdk.out and/or .cdktest-cache folder at instance deletion.
+
+        Either folder is kept when its argument is None.
+        """
 
         def remove_readonly(func, path, execinfo):
             _LOGGER.warning(f"Issue deleting file {path}, caused by {execinfo}")
@@ -169,11 +562,12 @@ class CDKTest:
             func(path)
 
         # Default output folder is "cdk.out"
-        _LOGGER.debug("cleaning up %s %s", appdir, "cdk.out")
-        cdkout = os.path.join(appdir, "cdk.out")
-        if Path(cdkout).is_dir():
-            shutil.rmtree(cdkout, onerror=remove_readonly)
-        if Path(cache_dir).is_dir():
+        if appdir is not None:
+            _LOGGER.debug("cleaning up %s %s", appdir, "cdk.out")
+            cdkout = os.path.join(appdir, "cdk.out")
+            if Path(cdkout).is_dir():
+                shutil.rmtree(cdkout, onerror=remove_readonly)
+        if cache_dir is not None and Path(cache_dir).is_dir():
             shutil.rmtree(cache_dir, onerror=remove_readonly)
 
     def _dirhash(
@@ -216,11 +610,10 @@ class CDKTest:
     def generate_cache_hash(self, method_kwargs) -> str:
         """Returns a hash value using the instance attributes"""
         params = {
-            **{
-                k: v
-                for k, v in self.__dict__.items()
-                if k in ["binary", "_basedir", "appdir", "env"]
-            }
+            "binary": self.binary,
+            "_basedir": self._basedir,
+            "appdir": self.appdir,
+            "env": self.env,
         }
         params["appdir"] = self._dirhash(
             self.appdir, sha1(), ignore_hidden=True, exclude_directories=["cdk.out"]
@@ -292,8 +685,9 @@ class CDKTest:
     def synthesize(self, use_cache: bool = False) -> Dict[str, Any]:
         """Run cdk synthesize command."""
         cmd_args = parse_args("synth", self.appdir)
-        output = self.execute_command("synth", *cmd_args).out
-        return self._template_formatter(output)
+        return self.execute_command(
+            "synth", *cmd_args, output_parser=CFTemplateStreamParser
+        ).out
 
     @_cache
     def deploy(self, use_cache: bool = False) -> str:
@@ -309,15 +703,86 @@ class CDKTest:
         cmd_args = parse_args("destroy", self.appdir)
         return self.execute_command("destroy", *cmd_args).out
 
-    def execute_command(self, cmd: str, *cmd_args) -> None:
-        """Run arbitrary CDK command."""
+    def execute_command(
+        self,
+        cmd: str,
+        *cmd_args,
+        timeout: float = None,
+        output_parser: Callable[[], Any] = None,
+    ) -> CDKCommandOutput:
+        """Run arbitrary CDK command.
+
+        Commands exiting with one of the instance retry_retcodes are retried
+        with exponential backoff, any other non-zero exit code raises
+        CDKTestError.
+
+        Args:
+          cmd: CDK subcommand name.
+          cmd_args: Additional arguments for the subcommand.
+          timeout: Optional number of seconds overriding the instance timeout.
+          output_parser: Optional factory for an object with feed() and close()
+            methods. Output is fed to it while the command runs instead of
+            being collected, and the value returned by close() becomes the
+            command output. The end of the output is kept for the error
+            message of a failing command.
+        """
         _LOGGER.debug([cmd, cmd_args])
         cmdline = [item for item in self.binary]
         cmdline.append(cmd)
         cmdline.extend(cmd_args)
-        retcode, full_output_lines = None, []
+        _check_timeout(timeout)
+        timeout = self.timeout if timeout is None else timeout
+        delay = self.retry_backoff
+        for attempt in range(self.retries + 1):
+            parser = output_parser() if output_parser else None
+            with _PROCESS_SLOTS:
+                retcode, full_output, err = self._run_process(cmdline, timeout, parser)
+            if retcode == 0:
+                if parser:
+                    full_output = parser.close()
+                break
+            if retcode in self.retry_retcodes and attempt < self.retries:
+                _LOGGER.warning(
+                    "Command %s exited with %s, retrying in %ss", cmd, retcode, delay
+                )
+                time.sleep(delay)
+                delay *= 2
+                continue
+            message = f"Error running command {cmd}: {retcode} {full_output} {err}"
+            _LOGGER.critical(message)
+            raise CDKTestError(message, err)
+        return CDKCommandOutput(retcode, full_output, err)
+
+    def _run_process(self, cmdline: List[str], timeout: float = None, parser=None):
+        """Run a command in its own process group and collect its output.
+
+        When a parser is given, output is fed to it and only its last
+        _OUTPUT_TAIL_SIZE characters are collected, for error messages. Errors
+        raised by the parser are only reported if the command succeeds.
+        """
+        full_output_lines, err_chunks = [], []
+        parse_error = None
+        timed_out, finished = threading.Event(), threading.Event()
+        timeout_lock = threading.Lock()
+
+        def on_timeout():
+            # output is complete if the timer fires just after the command
+            with timeout_lock:
+                if finished.is_set():
+                    return
+                timed_out.set()
+            # children still holding the pipes keep the group alive on POSIX
+            if os.name == "nt" and p.poll() is not None:
+                return
+            _kill_process_group(p)
+
         try:
             stderr_mode = subprocess.STDOUT if os.name == "nt" else subprocess.PIPE
+            group_args = (
+                {"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP}
+                if os.name == "nt"
+                else {"start_new_session": True}
+            )
             p = subprocess.Popen(
                 cmdline,
                 stdout=subprocess.PIPE,
@@ -327,21 +792,59 @@ class CDKTest:
                 universal_newlines=True,
                 encoding="utf-8",
                 errors="ignore",
+                **group_args,
             )
-            while True:
-                output = p.stdout.readline()
-                if output == "" and p.poll() is not None:
-                    break
-                if output:
-                    full_output_lines.append(output)
-            retcode = p.poll()
-            p.wait()
         except FileNotFoundError as e:
             raise CDKTestError(f"CDK executable not found: {e}") from e
-        _, err = p.communicate()
-        full_output = "".join(full_output_lines)
-        if retcode in [1, 11]:
-            message = f"Error running command {cmd}: {retcode} {full_output} {err}"
+        timer = threading.Timer(timeout, on_timeout) if timeout is not None else None
+        # stderr is drained alongside stdout so a full pipe cannot block cdk
+        err_reader = (
+            threading.Thread(target=lambda: err_chunks.append(p.stderr.read()))
+            if p.stderr
+            else None
+        )
+        try:
+            if timer:
+                timer.start()
+            if err_reader:
+                err_reader.start()
+            if parser:
+                # feed whatever is available rather than one line at a time
+                decoder = codecs.getincrementaldecoder("utf-8")(errors="ignore")
+                tail, tail_size = deque(), 0
+                while True:
+                    chunk = p.stdout.buffer.read1(65536)
+                    output = decoder.decode(chunk, final=not chunk)
+                    tail.append(output)
+                    tail_size += len(output)
+                    while tail_size - len(tail[0]) >= _OUTPUT_TAIL_SIZE:
+                        tail_size -= len(tail.popleft())
+                    if parse_error is None:
+                        try:
+                            parser.feed(output)
+                        except Exception as e:  # pylint: disable=broad-except
+                            parse_error = e
+                    if not chunk:
+                        break
+                full_output_lines = list(tail)
+            else:
+                for output in p.stdout:
+                    full_output_lines.append(output)
+            p.wait()
+            with timeout_lock:
+                finished.set()
+        finally:
+            if timer:
+                timer.cancel()
+            # children left behind by wrappers such as npx share the group
+            _kill_process_group(p, grace=0)
+            if err_reader and err_reader.is_alive():
+                err_reader.join()
+        err = "".join(err_chunks) if err_reader else None
+        if timed_out.is_set():
+            message = f"Command {cmdline} timed out after {timeout}s"
             _LOGGER.critical(message)
-            raise CDKTestError(message, err)
-        return CDKCommandOutput(retcode, full_output, err)
+            raise CDKTestTimeoutError(message)
+        if parse_error is not None and p.returncode == 0:
+            raise parse_error
+        return p.returncode, "".join(full_output_lines), err
@@ -0,0 +1,87 @@
+"Test the streaming cf template parser."
+
+import json
+import sys
+import pytest
+import cdktest
+from unittest.mock import patch
+
+pytestmark = pytest.mark.test_parser
+
+
+TEMPLATE = {
+    "Description": 'Braces { [ and "quotes", in a string',
+    "Resources": {
+        "Vpc8378EB38": {
+            "Type": "AWS::EC2::VPC",
+            "Properties": {"CidrBlock": "10.0.0.0/16", "Tags": [{"Key": "a,b"}]},
+        },
+        "Handle": {"Type": "AWS::CloudFormation::WaitConditionHandle"},
+        "SubnetA": {
+            "Type": "AWS::EC2::Subnet",
+            "Properties": {"VpcId": {"Ref": "Vpc8378EB38"}},
+        },
+        "SubnetB": {
+            "Type": "AWS::EC2::Subnet",
+            "Properties": {"VpcId": {"Ref": "Vpc8378EB38"}},
+        },
+    },
+    "Outputs": {"VpcId": {"Value": {"Ref": "Vpc8378EB38"}}},
+    "Rules": [{"Assertions": []}],
+}
+
+
+def parse(text, size):
+    parser = cdktest.CFTemplateStreamParser()
+    for i in range(0, len(text), size):
+        parser.feed(text[i : i + size])
+    return parser.close()
+
+
+@pytest.mark.parametrize("indent", [None, 2])
+@pytest.mark.parametrize("size", [1, 7, 1 << 20])
+def test_parse_matches_json(indent, size):
+    text = "Bundling asset...\n" + json.dumps(TEMPLATE, indent=indent) + "\n"
+    output = parse(text, size)
+    assert dict(output) == TEMPLATE
+    assert list(output) == list(TEMPLATE)
+    assert (
+        output.resources["AWS::EC2::Subnet"] == [{"VpcId": {"Ref": "Vpc8378EB38"}}] * 2
+    )
+    assert output.resources["AWS::CloudFormation::WaitConditionHandle"] == [{}]
+    assert output.logical_ids["AWS::EC2::Subnet"] == ["SubnetA", "SubnetB"]
+    assert output.resources == cdktest.CFTemplateResources(TEMPLATE).resources
+
+
+def test_incomplete_template_raises():
+    with pytest.raises(cdktest.CDKTestError):
+        parse(json.dumps(TEMPLATE, indent=2)[:-1], 16)
+
+
+def test_execute_command_feeds_parser(tmp_path):
+    cdk = cdktest.CDKTest(str(tmp_path), binary=sys.executable)
+    script = f"import json; print(json.dumps({TEMPLATE!r}, indent=2))"
+    output = cdk.execute_command(
+        "-c", script, output_parser=cdktest.CFTemplateStreamParser
+    )
+    assert dict(output.out) == TEMPLATE
+
+
+def test_failed_command_keeps_output_tail(tmp_path):
+    cdk = cdktest.CDKTest(str(tmp_path), binary=sys.executable)
+    script = "import sys; print('x' * 200000); print('synth failed'); sys.exit(1)"
+    with pytest.raises(cdktest.CDKTestError, match="synth failed") as e:
+        cdk.execute_command("-c", script, output_parser=cdktest.CFTemplateStreamParser)
+    assert len(str(e.value)) < 100000
+
+
+def test_large_member_in_small_chunks():
+    mappings = {f"Key{i}": {"Value": "x" * 40} for i in range(50000)}
+    template = {**TEMPLATE, "Mappings": {"Big": mappings}}
+    text = json.dumps(template, indent=2) + "\n"
+    with patch.object(cdktest.json, "loads", wraps=json.loads) as loads:
+        output = parse(text, 512)
+    assert dict(output) == template
+    # the member is decoded once, from its chunks joined when it closes
+    big = [call for call in loads.call_args_list if '"Key49999"' in call.args[0]]
+    assert len(big) == 1
@@ -0,0 +1,113 @@
+"Test process lifecycle control using the Python interpreter as binary."
+
+import os
+import sys
+import subprocess
+import time
+import pytest
+import cdktest
+
+pytestmark = pytest.mark.test_process
+
+
+@pytest.fixture
+def cdk(tmp_path):
+    return cdktest.CDKTest(str(tmp_path), binary=sys.executable)
+
+
+@pytest.mark.skipif(os.name == "nt", reason="uses POSIX process groups")
+def test_timeout_kills_process_group(cdk, tmp_path):
+    pidfile = tmp_path / "child.pid"
+    script = (
+        "import subprocess, sys, time;"
+        "c = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(60)']);"
+        f"open({str(pidfile)!r}, 'w').write(str(c.pid));"
+        "time.sleep(60)"
+    )
+    start = time.monotonic()
+    with pytest.raises(cdktest.CDKTestTimeoutError):
+        cdk.execute_command("-c", script, timeout=2)
+    assert time.monotonic() - start < 30
+    child_pid = int(pidfile.read_text())
+    for _ in range(50):
+        try:
+            os.kill(child_pid, 0)
+        except ProcessLookupError:
+            break
+        time.sleep(0.1)
+    else:
+        pytest.fail(f"Child process {child_pid} survived the timeout")
+
+
+@pytest.mark.skipif(os.name == "nt", reason="uses POSIX process groups")
+def test_timeout_kills_child_holding_pipe(cdk):
+    script = (
+        "import subprocess, sys;"
+        "subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(60)']);"
+        "print('parent done')"
+    )
+    start = time.monotonic()
+    with pytest.raises(cdktest.CDKTestTimeoutError):
+        cdk.execute_command("-c", script, timeout=2)
+    assert time.monotonic() - start < 30
+
+
+@pytest.mark.parametrize("timeout", [0, -1])
+def test_non_positive_timeout_rejected(cdk, tmp_path, timeout):
+    with pytest.raises(cdktest.CDKTestError):
+        cdk.execute_command("-c", "pass", timeout=timeout)
+    with pytest.raises(cdktest.CDKTestError):
+        cdktest.CDKTest(str(tmp_path), timeout=timeout)
+
+
+def test_nonzero_retcode_raises(cdk):
+    with pytest.raises(cdktest.CDKTestError):
+        cdk.execute_command("-c", "import sys; sys.exit(3)")
+
+
+def test_retry_transient_retcode(cdk, tmp_path):
+    counter = tmp_path / "attempts"
+    script = (
+        "import pathlib, sys;"
+        f"p = pathlib.Path({str(counter)!r});"
+        "n = int(p.read_text()) + 1 if p.exists() else 1;"
+        "p.write_text(str(n));"
+        "print('attempt', n);"
+        "sys.exit(0 if n == 3 else 75)"
+    )
+    cdk.retries = 2
+    cdk.retry_retcodes = (75,)
+    cdk.retry_backoff = 0.01
+    output = cdk.execute_command("-c", script)
+    assert output.retcode == 0
+    assert output.out.strip() == "attempt 3"
+
+
+def test_set_max_processes_rejects_zero():
+    with pytest.raises(cdktest.CDKTestError):
+        cdktest.set_max_processes(0)
+
+
+def test_large_stderr_does_not_block(cdk):
+    script = "import sys; sys.stderr.write('x' * (1 << 20)); print('done')"
+    output = cdk.execute_command("-c", script, timeout=30)
+    assert output.out.strip() == "done"
+    assert len(output.err) == 1 << 20
+
+
+@pytest.mark.parametrize("value", ["0", "-1", "many"])
+def test_invalid_max_processes_env_falls_back(tmp_path, value):
+    script = (
+        "import sys, cdktest;"
+        f"cdktest.CDKTest({str(tmp_path)!r}, binary=sys.executable)"
+        ".execute_command('-c', 'pass')"
+    )
+    env = {
+        **os.environ,
+        "CDKTEST_MAX_PROCESSES": value,
+        "PYTHONPATH": os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    }
+    result = subprocess.run(
+        [sys.executable, "-c", script], env=env, capture_output=True, timeout=30
+    )
+    assert result.returncode == 0, result.stderr
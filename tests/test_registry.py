@@ -0,0 +1,90 @@
+"Test the shared CDKTest instance registry."
+
+import os
+import pytest
+import cdktest
+from pathlib import Path
+
+pytestmark = pytest.mark.test_registry
+
+
+@pytest.fixture
+def appdir(tmp_path):
+    cdkout = tmp_path / "app" / "cdk.out"
+    cdkout.mkdir(parents=True)
+    return cdkout.parent
+
+
+@pytest.fixture
+def cache_dir(tmp_path):
+    cache_dir = tmp_path / ".cdktest-cache"
+    cache_dir.mkdir()
+    return str(cache_dir)
+
+
+def test_get_interns_per_configuration(appdir, cache_dir):
+    first = cdktest.CDKTest.get(str(appdir), binary="npx cdk", cache_dir=cache_dir)
+    second = cdktest.CDKTest.get(str(appdir), binary="npx cdk", cache_dir=cache_dir)
+    other = cdktest.CDKTest.get(str(appdir), binary="cdk", cache_dir=cache_dir)
+    assert first is second
+    assert first is not other
+    first.release()
+    second.release()
+    assert (appdir / "cdk.out").is_dir()
+    assert Path(cache_dir).is_dir()
+    other.release()
+    assert not (appdir / "cdk.out").exists()
+    assert not Path(cache_dir).exists()
+
+
+def test_get_applies_defaults(appdir, cache_dir):
+    implicit = cdktest.CDKTest.get(str(appdir), cache_dir=cache_dir)
+    explicit = cdktest.CDKTest.get(
+        str(appdir), binary="cdk", env={}, enable_cache=False, cache_dir=cache_dir
+    )
+    try:
+        assert implicit is explicit
+    finally:
+        implicit.release()
+        explicit.release()
+
+
+def test_get_interns_per_class(appdir, cache_dir):
+    class CustomCDKTest(cdktest.CDKTest):
+        pass
+
+    base = cdktest.CDKTest.get(str(appdir), cache_dir=cache_dir)
+    custom = CustomCDKTest.get(str(appdir), cache_dir=cache_dir)
+    try:
+        assert type(custom) is CustomCDKTest
+        assert base is not custom
+    finally:
+        base.release()
+        custom.release()
+
+
+def test_release_cleans_up_after_last_reference(appdir, cache_dir):
+    first = cdktest.CDKTest.get(str(appdir), cache_dir=cache_dir)
+    second = cdktest.CDKTest.get(str(appdir), cache_dir=cache_dir)
+    first.release()
+    assert (appdir / "cdk.out").is_dir()
+    second.release()
+    assert not (appdir / "cdk.out").exists()
+    third = cdktest.CDKTest.get(str(appdir), cache_dir=cache_dir)
+    assert third is not first
+    third.release()
+
+
+def test_default_cache_dir_is_caller_dir(appdir):
+    cdk = cdktest.CDKTest.get(str(appdir))
+    try:
+        assert cdk.cache_dir == Path(os.path.dirname(__file__)) / ".cdktest-cache"
+    finally:
+        cdk.release()
+
+
+def test_env_is_read_when_first_used(appdir, monkeypatch):
+    cdk = cdktest.CDKTest(str(appdir), env={"foo": "bar"})
+    monkeypatch.setenv("CDKTEST_LATE_VARIABLE", "set after construction")
+    assert cdk.env["foo"] == "bar"
+    assert cdk.env["CDKTEST_LATE_VARIABLE"] == "set after construction"